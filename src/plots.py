@@ -14,24 +14,33 @@ import os
 import configparser
 from ase import io, Atoms
 import diode
-import math
 from colour import Color
 from scipy.interpolate import interpn
 from functools import cmp_to_key
 from scipy.interpolate import interpn
 import plotly.express as px
-import plotly.graph_objects as go
 
-def plot_APF(APF : np.array, name : str):
+def APF_coordinates(APF):
+	"""! Get the two columns of an accumulated persistence function as 1d views, without copying
+	
+	@param APF - pd.DataFrame with columns 'mean age' and 'lifetime' (as from calculate_APF), or np.array with 2 columns
+	
+	@result the mean age and APF columns
+	"""
+	if isinstance(APF, pd.DataFrame):
+		return APF["mean age"].to_numpy(), APF["lifetime"].to_numpy()
+	return APF[:,0], APF[:,1]
+
+def plot_APF(APF, name : str):
 	"""! Plot an accumulated persistence function
 	
-	@param APF - np.array with 2 columns of coordinates which define the APF
+	@param APF - pd.DataFrame or np.array with 2 columns of coordinates which define the APF
 	@param name - title for the plot
 	
 	@result a plotly.express figure
 	"""
-	
-	fig = px.line(x=APF["mean age"], y=APF["lifetime"], labels={'x':'m (Å$^2$)', 'y':'APF (Å$^2$)'}, title=name)
+	x, y = APF_coordinates(APF)
+	fig = px.line(x=x, y=y, labels={'x':'m (Å$^2$)', 'y':'APF (Å$^2$)'}, title=name)
 	fig.update_xaxes(rangemode="tozero")
 	fig.update_yaxes(rangemode="tozero")
 	return fig
@@ -39,17 +48,26 @@ def plot_APF(APF : np.array, name : str):
 def plot_APFs(APFs : list, APF_names : list, fig_name : str):#, APF_colour, APF_label):
 	"""! Plot a set accumulated persistence function, with automatic colour differentiation.
 	
-	@param APFs - accumlated persistence functions to plot
+	@param APFs - accumlated persistence functions to plot, each a pd.DataFrame or np.array with 2 columns
+	@param APF_names - names of the APFs, used as the legend
+	@param fig_name - title for the plot
 	
-	@result a matplotlib figure
+	@result a plotly.express figure
 	"""
 	assert len(APFs) == len(APF_names)
-	fig = go.Figure(labels={'x':'m (Å$^2$)', 'y':'APF (Å$^2$)'}, title=fig_name)
-	last_pt = math.ceil(max([APFs[i][-1,0] for i in range(len(APFs))])*1.1)
-	for i in range(len(APFs)):
-		APFs[i] = np.vstack([APFs[i], [last_pt, APFs[i][-1,1]]])
-	for i in range(len(APFs)):
-		fig.add_trace(go.Scatter(x=APFs[i][:,0], y=APFs[i][:,1], mode="lines", name=APF_names[i]))
+	coords = [APF_coordinates(APF) for APF in APFs]
+	last_pt = int(np.ceil(max(x[-1] for x, y in coords)*1.1))
+	pts = np.empty((sum(x.shape[0]+1 for x, y in coords), 2))
+	series = np.empty(pts.shape[0], dtype=np.int32)
+	off = 0
+	for i, (x, y) in enumerate(coords):
+		n = x.shape[0]
+		pts[off:off+n,0] = x
+		pts[off:off+n,1] = y
+		pts[off+n] = [last_pt, y[-1]] #extend each APF to the same end point
+		series[off:off+n+1] = i
+		off += n+1
+	fig = px.line(x=pts[:,0], y=pts[:,1], color=np.asarray(APF_names)[series], line_group=series, labels={'x':'m (Å$^2$)', 'y':'APF (Å$^2$)', 'color':''}, title=fig_name)
 	fig.update_xaxes(rangemode="tozero")
 	fig.update_yaxes(rangemode="tozero")
 	return fig
@@ -64,24 +82,12 @@ def plot_PD(dgm, name : str):
 	
 	@result a plotly.express figure
 	"""
-	try:
-		max_val = max(dgm["death"][dgm["death"] != math.inf])
-	except:
-		max_val = max(dgm["birth"])
-	birth = []
-	death = []
-	inf_fin = []
-	fig = go.Figure()
-	for i in range(dgm.shape[0]):
-		if dgm["death"].iloc[i] == math.inf:
-			birth.append(dgm["birth"].iloc[i])
-			death.append(max_val*1.1)
-			inf_fin.append("inf")
-		else:
-			birth.append(dgm["birth"].iloc[i])
-			death.append(dgm["death"].iloc[i])
-			inf_fin.append("fin")
-	to_plot = pd.DataFrame({"birth":birth, "death":death, "inf_fin":inf_fin})
+	deaths_raw = dgm["death"].to_numpy()
+	mask = np.isinf(deaths_raw) #points which never die
+	max_val = deaths_raw[~mask].max(initial=-np.inf)
+	if max_val == -np.inf: #no finite points, so use the births instead
+		max_val = dgm["birth"].max()
+	to_plot = pd.DataFrame({"birth":dgm["birth"].to_numpy(), "death":np.where(mask, max_val*1.1, deaths_raw), "inf_fin":pd.Categorical.from_codes(mask.astype(np.int8), categories=["fin", "inf"])})
 	fig = px.scatter(to_plot, x="birth", y="death", symbol="inf_fin", title=name)
 	fig.update_xaxes(rangemode="tozero")
 	fig.update_yaxes(rangemode="tozero")
@@ -98,35 +104,26 @@ def plot_PDs(dgms, name : str):
 
 	@results a plotly.express figure
 	"""
-	birth = []
-	death = []
-	samp = []
-	inf_fin = []
-	vals = []
-	for dgm in dgms:
-		dgm_vals = []
-		for d in dgm["death"]:
-			if d != math.inf:
-				dgm_vals.append(d)
-		if len(dgm_vals) !=0:
-			vals.append(max(dgm_vals))
-	if len(vals) != 0:
-		max_val = max(vals)
-	else:
-		max_val = max([max(b) for b in dgm["birth"] for dgm in dmgs])
-	fig = go.Figure()
-	for i in range(len(dgms)):
-		for j in range(len(dgms[i]["death"])):
-			if dgms[i]["death"].iloc[j] == math.inf:
-				birth.append(dgs[i]["birth"].iloc[j])
-				death.append(max_val*1.1)
-				samp.append(str(i))
-				inf_fin.append("inf")
-			else:
-				birth.append(dgms[i]["birth"].iloc[j])
-				death.append(dgms[i]["death"].iloc[j])
-				samp.append(str(i))
-				inf_fin.append("fin")
+	n_pts = sum(dgm.shape[0] for dgm in dgms)
+	birth = np.empty(n_pts)
+	death = np.empty(n_pts)
+	samp = np.empty(n_pts, dtype=np.int32)
+	is_inf = np.empty(n_pts, dtype=bool)
+	max_val = -np.inf
+	off = 0
+	for i, dgm in enumerate(dgms):
+		n = dgm.shape[0]
+		birth[off:off+n] = dgm["birth"].to_numpy()
+		death[off:off+n] = dgm["death"].to_numpy()
+		samp[off:off+n] = i
+		np.isinf(death[off:off+n], out=is_inf[off:off+n]) #points which never die
+		max_val = max(max_val, death[off:off+n][~is_inf[off:off+n]].max(initial=-np.inf))
+		off += n
+	samp = pd.Categorical.from_codes(samp, categories=[str(i) for i in range(len(dgms))])
+	if max_val == -np.inf: #no finite points, so use the births instead
+		max_val = birth.max()
+	death[is_inf] = max_val*1.1
+	inf_fin = pd.Categorical.from_codes(is_inf.astype(np.int8), categories=["fin", "inf"])
 	to_plot = pd.DataFrame({"birth":birth, "death":death, "sample":samp, "inf_fin":inf_fin})
 	fig = px.scatter(to_plot, x="birth", y="death", color="sample", symbol="inf_fin", title=name)
 	fig.update_xaxes(rangemode="tozero")
@@ -138,85 +135,36 @@ def plot_kernel_image_cokernel_PD(kicr, d : int, codomain : bool, kernel : bool,
 	"""! Plot kernel, image, cokernel on same figure
 	@param kicr 	oineus::KerImCokReduced 
 	@param d	 	the dimension to extract (either 1 or 2)
+	@param codomain	bool to plot codomain
 	@param kernel	bool to plot kernel
 	@param image	bool to plot image
 	@param cokernel	bool to plot cokernel
+	@param name		title to use for the plot
 	@return figu	figure with the chosen PD diagrams
 	"""
-	fig = go.Figure()
-	max_val = -math.inf
-	if codomain:
-		codomain_pd = kicr.codomain_diagrams().in_dimension(d)
-		print("codomain diagram has {} points".format(codomain_pd.shape[0]))
-		if math.inf in codomain_pd[:,1] and max_val < max([d for d in codomain_pd[:,1] if d !=math.inf]):
-			max_val = max(codomain_pd[:,1])
-	if kernel:
-		kernel_pd = kicr.kernel_diagrams().in_dimension(d)
-		print("kernel diagram has {} points".format(kernel_pd.shape[0]))
-		if math.inf in kernel_pd[:,1] and max_val < max([d for d in kernel_pd[:,1] if d !=math.inf]):
-			max_val = max(kernel_pd[:,1])
-	if image:
-		image_pd = kicr.image_diagrams().in_dimension(d)
-		print("image diagram has {} points".format(image_pd.shape[0]))
-		if math.inf in image_pd[:,1]  and max_val < max([d for d in image_pd[:,1] if d !=math.inf]):
-			max_val = max(image_pd[:,1])
-	if cokernel:
-		print("cokernel diagram has {} points".format(cokernel_pd.shape[0]))
-		cokernel_pd = kicr.cokernel_diagrams().in_dimension(d)
-		if math.inf in cokernel_pd[:,1] and max_val < max([d for d in cokernel_pd[:,1] if d !=math.inf]):
-			max_val =  max(cokernel_pd[:,1])
-	birth = []
-	death = []
-	pt_type = []
-	inf_fin = []
+	dgms = {}
 	if codomain:
-		for i in range(codomain_pd.shape[0]):
-			if codomain_pd[i,1] == math.inf:
-				birth.append(codomain_pd[i,0])
-				death.append(max_val*1.1)
-				pt_type.append("codomain")
-				inf_fin.append("inf")
-			else:
-				birth.append(codomain_pd[i,0])
-				death.append(codomain_pd[i,1])
-				pt_type.append("codomain")
-				inf_fin.append("fin")
+		dgms["codomain"] = kicr.codomain_diagrams().in_dimension(d)
 	if kernel:
-		for i in range(kernel_pd.shape[0]):
-			if kernel_pd[i,1] == math.inf:
-				birth.append(kernel_pd[i,0])
-				death.append(max_val*1.1)
-				pt_type.append("kernel")
-				inf_fin.append("inf")
-			else:
-				birth.append(kernel_pd[i,0])
-				death.append(kernel_pd[i,1])
-				pt_type.append("kernel")
-				inf_fin.append("fin")
+		dgms["kernel"] = kicr.kernel_diagrams().in_dimension(d)
 	if image:
-		for i in range(image_pd.shape[0]):
-			if image_pd[i,1] == math.inf:
-				birth.append(image_pd[i,0])
-				death.append(max_val*1.1)
-				pt_type.append("image")
-				inf_fin.append("inf")
-			else:
-				birth.append(image_pd[i,0])
-				death.append(image_pd[i,1])
-				pt_type.append("image")
-				inf_fin.append("fin")
+		dgms["image"] = kicr.image_diagrams().in_dimension(d)
 	if cokernel:
-		for i in range(cokernel_pd.shape[0]):
-			if cokernel_pd[i,1] == math.inf:
-				birth.append(cokernel_pd[i,0])
-				death.append(max_val*1.1)
-				pt_type.append("cokernel")
-				inf_fin.append("inf")
-			else:
-				birth.append(cokernel_pd[i,0])
-				death.append(cokernel_pd[i,1])
-				pt_type.append("cokernel")
-				inf_fin.append("fin")
+		dgms["cokernel"] = kicr.cokernel_diagrams().in_dimension(d)
+	if len(dgms) == 0: #nothing selected, so return an empty plot
+		return px.scatter(title=name)
+	is_inf = {}
+	max_val = -np.inf
+	for pt_name, dgm in dgms.items():
+		print("{} diagram has {} points".format(pt_name, dgm.shape[0]))
+		is_inf[pt_name] = np.isinf(dgm[:,1])
+		max_val = max(max_val, dgm[~is_inf[pt_name],1].max(initial=-np.inf))
+	if max_val == -np.inf: #no finite points, so use the births instead
+		max_val = max((dgm[:,0].max(initial=0.0) for dgm in dgms.values()), default=0.0)
+	birth = np.concatenate([dgm[:,0] for dgm in dgms.values()])
+	death = np.concatenate([np.where(is_inf[pt_name], max_val*1.1, dgm[:,1]) for pt_name, dgm in dgms.items()])
+	pt_type = pd.Categorical.from_codes(np.concatenate([np.full(dgm.shape[0], i, dtype=np.int8) for i, dgm in enumerate(dgms.values())]), categories=list(dgms.keys()))
+	inf_fin = pd.Categorical.from_codes(np.concatenate(list(is_inf.values())).astype(np.int8), categories=["fin", "inf"])
 	to_plot = pd.DataFrame({"birth":birth, "death":death, "pt_type":pt_type, "inf_fin":inf_fin})
 	fig = px.scatter(to_plot, x="birth", y="death", symbol="inf_fin", color="pt_type", title=name)
 	fig.update_xaxes(rangemode="tozero")
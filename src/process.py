@@ -17,7 +17,6 @@ import diode
 import math
 from colour import Color
 from scipy.interpolate import interpn
-from functools import cmp_to_key
 from scipy.interpolate import interpn
 import plotly.express as px
 import plotly.graph_objects as go
@@ -131,22 +130,23 @@ def convert_simps_to_oineus(simplices : list):
 	oin_simps = [oineus.Simplex_double(s[0], s[1]) for s in simplices]
 	return oin_simps
 
-def oineus_compare(x, y):
-	"""! Comparison to compare list of simplicies to get them in the order for oineus
-	@param x	simplex to compare
-	@param y	simplex to compare
+def oineus_arrays(simplices : list):
+	"""! Convert the simplices from diode into arrays with one row per simplex, sorted in the order for oineus, by dimension and then by first vertex
+	@param simplices	list of simplices from diode
 
-	@return -1 if x<y, 1 otherwise
+	@return V			np.ndarray of the sorted vertices of each simplex, padded with -1
+	@return filt		np.ndarray of the filtration values
+	@return dims		np.ndarray of the number of vertices of each simplex
 	"""
-	if len(x[0]) == len(y[0]):
-		if x[0][0] <= y[0][0]:
-			return -1
-		else:
-			return 1
-	elif len(x[0]) < len(y[0]):
-		return -1
-	else:
-		return 1
+	dims = np.fromiter((len(s[0]) for s in simplices), dtype=np.int8, count=len(simplices))
+	filt = np.fromiter((s[1] for s in simplices), dtype=np.float64, count=len(simplices))
+	V = np.full((len(simplices), dims.max()), np.iinfo(np.int32).max, dtype=np.int32)
+	for i,s in enumerate(simplices):
+		V[i,:dims[i]] = s[0]
+	V.sort(axis=1) #padding sorts to the end of each row
+	V[V == np.iinfo(np.int32).max] = -1
+	order = np.lexsort((V[:,0], dims)) #last key is the primary one
+	return V[order], filt[order], dims[order]
 
 def sub_complex(points : pd.DataFrame, z_upper : float, z_lower : float):
 	"""! Given the points, and the upper and lower thresholds in the 'z'-component. 
@@ -155,15 +155,11 @@ def sub_complex(points : pd.DataFrame, z_upper : float, z_lower : float):
 	@param z_upper		float giving the upper threshold, any point above this is in the subcomplex
 	@param z_lower		float giving the lower threshold, any point below this is in the subcomplex
 
-	@return sub_comp	list containing the indices of the points on which we build the subcomplex
+	@return sub_comp	numpy.array of bools, True for the points on which we build the subcomplex
 	"""
 	print("The upper threshold is {} and the lower threshold is {}".format(z_upper, z_lower))
-	sub_comp = []
-	for i in points.index.values:
-		if (points["z"][i] >= z_upper) or (points["z"][i]    <= z_lower):
-			sub_comp.append(True)
-		else:
-			sub_comp.append(False)
+	z = points["z"].to_numpy()
+	sub_comp = (z >= z_upper) | (z <= z_lower)
 	return sub_comp     
 
 def oineus_filtration(points : pd.DataFrame, params : oineus.ReductionParams):
@@ -175,10 +171,8 @@ def oineus_filtration(points : pd.DataFrame, params : oineus.ReductionParams):
 	@return K			oineus.filtration
   	"""
 	simplices = diode.fill_weighted_alpha_shapes(points[["x","y","z","w"]].to_numpy())
-	for i in range(len(simplices)):
-		simplices[i] = [sorted(simplices[i][0]), simplices[i][1]]
-	simplices = sorted(simplices, key=cmp_to_key(oineus_compare))
-	K = [[i,s[0],s[1]] for i, s in enumerate(simplices)]
+	V, filt, dims = oineus_arrays(simplices)
+	K = [[i, V[i,:dims[i]].tolist(), f] for i, f in enumerate(filt.tolist())]
 	K = oineus.list_to_filtration(K)
 	return K
 		
@@ -192,37 +186,15 @@ def oineus_pair(points : pd.DataFrame, sub : list):
 	@return L			list of simplices for the subcomplex, as needed by oineus
 	@return L_to_K		list which tells you how to map the simplices in L to the simplices in K
 	"""
-	points["sub"]=sub
-	points.sort_values(by="sub", ascending=False)
 	simplices = diode.fill_weighted_alpha_shapes(points[["x","y","z","w"]].to_numpy())
-	for i in range(len(simplices)):
-		simplices[i] = [sorted(simplices[i][0]), simplices[i][1]]
-	simplices = sorted(simplices, key=cmp_to_key(oineus_compare))
-	L = []
-	not_L = []
-	for i,s in enumerate(simplices):
-		if len(s[0])==1:
-			if sub[s[0][0]]==True:
-				L.append([s[0], s[1]])
-			else:
-				not_L.append([s[0],s[1]])
-		else:
-			sub_complex = True
-			for v in s[0]:
-				if sub[v] == False:
-					sub_complex=False
-					break
-			if sub_complex == True:
-				L.append([s[0], s[1]])
-			else:
-				not_L.append([s[0],s[1]])
-	K = []
-	for s in L:
-		K.append(s)
-	for s in not_L:
-		K.append(s)
-	L = [[i,s[0],s[1]] for i, s in enumerate(L)]
-	K = [[i,s[0],s[1]] for i, s in enumerate(K)]
+	V, filt, dims = oineus_arrays(simplices)
+	sub_arr = np.asarray(sub, dtype=bool)
+	in_L = (sub_arr[np.where(V>=0, V, 0)] | (V<0)).all(axis=1) #a simplex is in L if all of its vertices are in the subset
+	perm = np.concatenate([np.flatnonzero(in_L), np.flatnonzero(~in_L)]) #simplices of L first, then the rest of K
+	verts = [V[p,:dims[p]].tolist() for p in perm]
+	vals = filt[perm].tolist()
+	K = [[i, v, f] for i, (v, f) in enumerate(zip(verts, vals))]
+	L = K[:in_L.sum()]
 	return K, L#, L_to_K
  
 def oineus_process(points : pd.DataFrame, params : oineus.ReductionParams):
@@ -1,111 +1,74 @@
 import oineus
 import diode
 import numpy
-import pandas
-from functools import cmp_to_key
 import math
+import os
+from numba import njit
 
-def oineus_pair(points : pandas.DataFrame, sub : list):
+def oineus_pair(points : numpy.ndarray, sub : list):
 	"""! Given a set of points, and the points that are in the subset L, construct the complexes and map between them. The subcomplex L will consists of all simplices whose vertex are in the subset.
 
-	@param points		pandas.DataFrame containing the points and their weights
+	@param points		numpy.ndarray containing the points and their weights, with columns x, y, z, w
 	@param sub			a list containing the indices of the points on which we construct the subcomplex
 
 	@return K			list of simplices for the entire complex, as needed by oineus
 	@return L			list of simplices for the subcomplex, as needed by oineus
 	@return L_to_K		list which tells you how to map the simplices in L to the simplices in K
 	"""
-	
-	points["sub"]=sub
-	points.sort_values(by="sub", ascending=False)
-	simplices = diode.fill_weighted_alpha_shapes(points[["x","y","z","w"]].to_numpy())
-	for i in range(len(simplices)):
-		simplices[i] = [sorted(simplices[i][0]), simplices[i][1]]
-	simplices = sorted(simplices, key=cmp_to_key(oineus_compare))
-	L = []
-	not_L = []
-	#L_to_K = []
-	#id_L = 0
-	#K_to_L = [-1 for i in range(len(simplices))]
-	for i,s in enumerate(simplices):
-		if len(s[0])==1:
-			if sub[s[0][0]]==True:
-				#K_to_L[i]= id_L            
-				L.append([s[0], s[1]])
-				#L_to_K.append(i)
-				#id_L +=1
-			else:
-				not_L.append([s[0],s[1]])
-		else:
-			sub_complex = True
-			for v in s[0]:
-				if sub[v] == False:
-					sub_complex=False
-					break
-			if sub_complex == True:
-				#verts = [K_to_L[v] for v in s[0]]
-				L.append([s[0], s[1]])
-				#L_to_K.append(i)
-			  	#K_to_L[i] = id_L
-				#id_L +=1
-			else:
-				not_L.append([s[0],s[1]])
-	K = []
-	for s in L:
-		K.append(s)
-	for s in not_L:
-		K.append(s)
-	L = [[i,s[0],s[1]] for i, s in enumerate(L)]
-	K = [[i,s[0],s[1]] for i, s in enumerate(K)]
+	simplices = diode.fill_weighted_alpha_shapes(points[:,:4])
+	V, filt, dims = oineus_arrays(simplices)
+	sub_arr = numpy.asarray(sub, dtype=bool)
+	in_L = (sub_arr[numpy.where(V>=0, V, 0)] | (V<0)).all(axis=1) #a simplex is in L if all of its vertices are in the subset
+	perm = numpy.concatenate([numpy.flatnonzero(in_L), numpy.flatnonzero(~in_L)]) #simplices of L first, then the rest of K
+	verts = [V[p,:dims[p]].tolist() for p in perm]
+	vals = filt[perm].tolist()
+	K = [[i, v, f] for i, (v, f) in enumerate(zip(verts, vals))]
+	L = K[:in_L.sum()]
 	return K, L#, L_to_K
 
 
-def oineus_compare(x, y):
-	"""! Comparison to compare list of simplicies to get them in the order for oineus
-	@param x	simplex to compare
-	@param y	simplex to compare
+def oineus_arrays(simplices : list):
+	"""! Convert the simplices from diode into arrays with one row per simplex, sorted in the order for oineus, by dimension and then by first vertex
+	@param simplices	list of simplices from diode
 
-	@return -1 if x<y, 1 otherwise
+	@return V			numpy.ndarray of the sorted vertices of each simplex, padded with -1
+	@return filt		numpy.ndarray of the filtration values
+	@return dims		numpy.ndarray of the number of vertices of each simplex
 	"""
-	if len(x[0]) == len(y[0]):
-		if x[0][0] <= y[0][0]:
-			return -1
-		else:
-			return 1
-	elif len(x[0]) < len(y[0]):
-		return -1
-	else:
-		return 1
-
-
-def sub_complex(points : pandas.DataFrame, z_upper : float, z_lower : float):
+	dims = numpy.fromiter((len(s[0]) for s in simplices), dtype=numpy.int8, count=len(simplices))
+	filt = numpy.fromiter((s[1] for s in simplices), dtype=numpy.float64, count=len(simplices))
+	V = numpy.full((len(simplices), dims.max()), numpy.iinfo(numpy.int32).max, dtype=numpy.int32)
+	for i,s in enumerate(simplices):
+		V[i,:dims[i]] = s[0]
+	V.sort(axis=1) #padding sorts to the end of each row
+	V[V == numpy.iinfo(numpy.int32).max] = -1
+	order = numpy.lexsort((V[:,0], dims)) #last key is the primary one
+	return V[order], filt[order], dims[order]
+
+
+def sub_complex(points : numpy.ndarray, z_upper : float, z_lower : float):
 	"""! Given the points, and the upper and lower thresholds in the 'z'-component. 
 
-	@param points		pandas.DataFrame containing of the points.
+	@param points		numpy.ndarray containing of the points, with columns x, y, z, w
 	@param z_upper		float giving the upper threshold, any point above this is in the subcomplex
 	@param z_lower		float giving the lower threshold, any point below this is in the subcomplex
 
-	@return sub_comp	list containing the indices of the points on which we build the subcomplex
+	@return sub_comp	numpy.array of bools, True for the points on which we build the subcomplex
 	"""
-	sub_comp = []
-	for i in range(points.shape[0]):
-		if (points["z"][i] >= z_upper) or (points["z"][i]    <= z_lower):
-			sub_comp.append(True)
-		else:
-			sub_comp.append(False)
+	z = points[:,2]
+	sub_comp = (z >= z_upper) | (z <= z_lower)
 	return sub_comp    
 
 
-def kernel_image_cokernel(points : pandas.DataFrame, kernel : bool, image : bool, cokernel : bool, n_threads : int, upper_threshold : float, lower_threshold : float):
-	"""! Given points, and parameters for oineus, calculate the kernel/image/cokernel persistence as desired.
+def kernel_image_cokernel(K : list, L : list, kernel : bool, image : bool, cokernel : bool, n_threads : int):
+	"""! Given the complex and subcomplex, and parameters for oineus, calculate the kernel/image/cokernel persistence as desired.
 
-	@param points			pandas.DataFrame of the points, with columns 'x','y','z','w' corresponding to the coordinates and weights respectively
+	@param K				list of simplices for the entire complex, as needed by oineus
+	@param L				list of simplices for the subcomplex, as needed by oineus
 	@param kernel 			boolean parameter to set if kernel persistence is calculated
 	@param image 			boolean parameter to set if image persistence is calculated
 	@param cokernel 		boolean parameter to set if cokernel persistence is calculated
 	@param n_threads		number of threads to use in oineus
-	@param upper_threshold	float, z-coordinate above which points are in the subcomplex 
-	@param lower_threshold	float z-coordinate below which points are in the subcomplex
 
 
 	@return kicr			oineus object which contains the kernel, image, cokernel persistence diagrams as required, can also calculate ones that weren't initially specificed
@@ -115,20 +78,238 @@ def kernel_image_cokernel(points : pandas.DataFrame, kernel : bool, image : bool
 	params.kernel = kernel
 	params.image = image
 	params.cokernel = cokernel
-	sub = sub_complex(points, upper_threshold, lower_threshold)
-	K, L = oineus_pair(points, sub)
 	L = oineus.list_to_filtration_float(L, params)
 	K = oineus.list_to_filtration_float(K, params)
 	kicr = oineus.KerImCokReduced_float(K,L,params,False)
 	return kicr
 
 
+@njit(cache=True)
+def uf_find(parent, x):
+	"""! Find the root of x in the union-find forest, halving the path as we go
+	@param parent	numpy.array of parent pointers
+	@param x		index of the element
+
+	@return x		index of the root
+	"""
+	while parent[x] != x:
+		parent[x] = parent[parent[x]]
+		x = parent[x]
+	return x
+
+
+@njit(cache=True)
+def uf_union(parent, rank, a, b):
+	"""! Merge the components of a and b in the union-find forest, by rank
+	@param parent	numpy.array of parent pointers
+	@param rank		numpy.array of the rank of each root
+	@param a		index of the first element
+	@param b		index of the second element
+
+	@return ra		index of the root of the merged component
+	"""
+	ra = uf_find(parent, a)
+	rb = uf_find(parent, b)
+	if ra == rb:
+		return ra
+	if rank[ra] < rank[rb]:
+		ra, rb = rb, ra
+	parent[rb] = ra
+	if rank[ra] == rank[rb]:
+		rank[ra] += 1
+	return ra
+
+
+@njit(cache=True)
+def uf_roots(parent, xs):
+	"""! Find the roots of several elements in the union-find forest
+	@param parent	numpy.array of parent pointers
+	@param xs		numpy.array of indices of the elements
+
+	@return roots	numpy.array of the roots
+	"""
+	roots = numpy.empty_like(xs)
+	for i in range(xs.shape[0]):
+		roots[i] = uf_find(parent, xs[i])
+	return roots
+
+
+@njit(cache=True)
+def pair_edges_0(parent, rank, birth, edge_verts, edge_vals):
+	"""! Pair the sorted edges with the components they kill, using the elder rule
+	@param parent		numpy.array of parent pointers
+	@param rank			numpy.array of the rank of each root
+	@param birth		numpy.array of the birth of the oldest vertex of each component
+	@param edge_verts	numpy.array of the vertices of the edges, sorted by filtration value
+	@param edge_vals	numpy.array of the filtration values of the edges, sorted
+
+	@return dgm			numpy.array of the finite points of the diagram
+	"""
+	dgm = numpy.empty((edge_vals.shape[0], 2))
+	n_pts = 0
+	for i in range(edge_vals.shape[0]):
+		ru = uf_find(parent, edge_verts[i,0])
+		rv = uf_find(parent, edge_verts[i,1])
+		if ru == rv:
+			continue #edge is positive, it creates a cycle
+		young = max(birth[ru], birth[rv])
+		old = min(birth[ru], birth[rv])
+		if edge_vals[i] > young:
+			dgm[n_pts,0] = young
+			dgm[n_pts,1] = edge_vals[i]
+			n_pts += 1
+		birth[uf_union(parent, rank, ru, rv)] = old
+	return dgm[:n_pts]
+
+
+@njit(cache=True)
+def pair_edges_image_cokernel_0(parent, rank, k_birth, l_birth, edge_verts, edge_vals):
+	"""! Pair the sorted edges of K with the image and cokernel classes they kill
+	@param parent		numpy.array of parent pointers
+	@param rank			numpy.array of the rank of each root
+	@param k_birth		numpy.array of the birth of the oldest vertex of each component
+	@param l_birth		numpy.array of the birth of the oldest vertex of L of each component, numpy.inf if there is none
+	@param edge_verts	numpy.array of the vertices of the edges, sorted by filtration value
+	@param edge_vals	numpy.array of the filtration values of the edges, sorted
+
+	@return image_pd	numpy.array of the finite points of the image diagram
+	@return cokernel_pd	numpy.array of the finite points of the cokernel diagram
+	"""
+	image_pd = numpy.empty((edge_vals.shape[0], 2))
+	cokernel_pd = numpy.empty((edge_vals.shape[0], 2))
+	n_image = 0
+	n_cokernel = 0
+	for i in range(edge_vals.shape[0]):
+		ru = uf_find(parent, edge_verts[i,0])
+		rv = uf_find(parent, edge_verts[i,1])
+		if ru == rv:
+			continue
+		if l_birth[ru] > l_birth[rv] or (l_birth[ru] == l_birth[rv] and k_birth[ru] > k_birth[rv]):
+			ru, rv = rv, ru #rv is the component which dies
+		if l_birth[rv] != numpy.inf:
+			if edge_vals[i] > l_birth[rv]:
+				image_pd[n_image,0] = l_birth[rv]
+				image_pd[n_image,1] = edge_vals[i]
+				n_image += 1
+		elif edge_vals[i] > k_birth[rv]:
+			cokernel_pd[n_cokernel,0] = k_birth[rv]
+			cokernel_pd[n_cokernel,1] = edge_vals[i]
+			n_cokernel += 1
+		old_k = min(k_birth[ru], k_birth[rv])
+		old_l = l_birth[ru]
+		root = uf_union(parent, rank, ru, rv)
+		k_birth[root] = old_k
+		l_birth[root] = old_l
+	return image_pd[:n_image], cokernel_pd[:n_cokernel]
+
+
+def union_find_arrays(simplices : list):
+	"""! Get the arrays needed for union-find from a list of simplices
+	@param simplices	list of simplices as needed by oineus, i.e. [id, vertices, value]
+
+	@return vert_ids	numpy.array of the vertices
+	@return vert_vals	numpy.array of the filtration values of the vertices
+	@return edge_verts	numpy.array of the vertices of the edges, sorted by filtration value
+	@return edge_vals	numpy.array of the filtration values of the edges, sorted
+	@return parent		numpy.array of parent pointers, each vertex in its own component
+	@return rank		numpy.array of zeros for the rank of each root
+	"""
+	verts = [s for s in simplices if len(s[1]) == 1]
+	edges = [s for s in simplices if len(s[1]) == 2]
+	vert_ids = numpy.fromiter((s[1][0] for s in verts), dtype=numpy.int32, count=len(verts))
+	vert_vals = numpy.fromiter((s[2] for s in verts), dtype=numpy.float64, count=len(verts))
+	edge_verts = numpy.array([s[1] for s in edges], dtype=numpy.int32).reshape(-1, 2)
+	edge_vals = numpy.fromiter((s[2] for s in edges), dtype=numpy.float64, count=len(edges))
+	order = numpy.argsort(edge_vals, kind="stable")
+	n = vert_ids.max(initial=-1) + 1
+	return vert_ids, vert_vals, edge_verts[order], edge_vals[order], numpy.arange(n, dtype=numpy.int32), numpy.zeros(n, dtype=numpy.int8)
+
+
+def persistence_0(simplices : list):
+	"""! Compute the dimension 0 persistence diagram of a filtration with union-find, using the elder rule.
+
+	@param simplices	list of simplices as needed by oineus, i.e. [id, vertices, value]
+
+	@return dgm			numpy.array with columns birth and death, infinite points have death math.inf
+	"""
+	vert_ids, vert_vals, edge_verts, edge_vals, parent, rank = union_find_arrays(simplices)
+	birth = numpy.full(parent.shape[0], math.inf)
+	birth[vert_ids] = vert_vals
+	dgm = pair_edges_0(parent, rank, birth, edge_verts, edge_vals)
+	roots = numpy.unique(uf_roots(parent, vert_ids))
+	essential = numpy.column_stack([birth[roots], numpy.full(roots.shape[0], math.inf)])
+	return numpy.vstack([dgm, essential])
+
+
+def image_cokernel_0(K : list, L : list):
+	"""! Compute the dimension 0 image and cokernel persistence diagrams of the inclusion of L into K with union-find on the edges of K.
+
+	Each component of K remembers the oldest vertex of L it contains (if any) and its oldest vertex overall. When an edge merges two components which both contain a vertex of L, the younger image class dies. Otherwise the component without a vertex of L is a cokernel class, and it dies (by the elder rule if neither contains a vertex of L).
+
+	@param K			list of simplices for the entire complex, as needed by oineus
+	@param L			list of simplices for the subcomplex, as needed by oineus
+
+	@return image_pd	numpy.array of the dimension 0 image diagram
+	@return cokernel_pd	numpy.array of the dimension 0 cokernel diagram
+	"""
+	vert_ids, vert_vals, edge_verts, edge_vals, parent, rank = union_find_arrays(K)
+	L_ids = numpy.fromiter((s[1][0] for s in L if len(s[1]) == 1), dtype=numpy.int32)
+	k_birth = numpy.full(parent.shape[0], math.inf) #oldest vertex in the component
+	l_birth = numpy.full(parent.shape[0], math.inf) #oldest vertex of L in the component
+	k_birth[vert_ids] = vert_vals
+	l_birth[L_ids] = k_birth[L_ids]
+	image_pd, cokernel_pd = pair_edges_image_cokernel_0(parent, rank, k_birth, l_birth, edge_verts, edge_vals)
+	roots = numpy.unique(uf_roots(parent, vert_ids))
+	in_image = numpy.isfinite(l_birth[roots])
+	image_pd = numpy.vstack([image_pd, numpy.column_stack([l_birth[roots[in_image]], numpy.full(in_image.sum(), math.inf)])])
+	cokernel_pd = numpy.vstack([cokernel_pd, numpy.column_stack([k_birth[roots[~in_image]], numpy.full((~in_image).sum(), math.inf)])])
+	return image_pd, cokernel_pd
+
+
+def domain_codomain_0(K : list, L : list):
+	"""! Given the complex and subcomplex, calculate their dimension 0 diagrams without calling oineus.
+
+	@param K				list of simplices for the entire complex, as needed by oineus
+	@param L				list of simplices for the subcomplex, as needed by oineus
+
+	@return domain_pd		numpy.array of the dimension 0 diagram of the subcomplex
+	@return codomain_pd		numpy.array of the dimension 0 diagram of the entire complex
+	"""
+	return persistence_0(L), persistence_0(K)
+
+
+def check_diagram(dgm, oineus_dgm, name : str):
+	"""! Check that a diagram agrees with the one from oineus, up to order and points of zero persistence. Raises an AssertionError if they differ.
+
+	@param dgm			numpy.array of the diagram to check
+	@param oineus_dgm	the same diagram as computed by oineus
+	@param name			name of the diagram, used in the error message
+	"""
+	dgms = []
+	for d in (dgm, oineus_dgm):
+		d = numpy.asarray(d, dtype=numpy.float64).reshape(-1, 2)
+		d = d[~numpy.isclose(d[:,0], d[:,1], rtol=1e-5)] #oineus works in single precision
+		dgms.append(d[numpy.lexsort((d[:,1], d[:,0]))])
+	if dgms[0].shape != dgms[1].shape or not numpy.allclose(dgms[0], dgms[1], rtol=1e-5):
+		raise AssertionError("{} diagram does not match oineus:\n{}\n{}".format(name, dgms[0], dgms[1]))
+
+
 points = numpy.random.random((10,4))
-points = pandas.DataFrame(points, columns=["x","y","z","w"])
+points[:,:3] *= 10
+upper_threshold = math.floor(max(points[:,2]))
+lower_threshold = math.ceil(min(points[:,2]))
+K, L = oineus_pair(points, sub_complex(points, upper_threshold, lower_threshold))
 
-kicr = kernel_image_cokernel(points, False, True, False, 4, math.floor(max(points["z"])), math.ceil(min(points["z"])))
+kicr = kernel_image_cokernel(K, L, False, True, True, os.cpu_count() or 4)
 
 domain_pd = kicr.domain_diagrams().in_dimension(1)
 for pt in domain_pd:
 	print(pt)
 
+domain_pd_0, codomain_pd_0 = domain_codomain_0(K, L)
+check_diagram(domain_pd_0, kicr.domain_diagrams().in_dimension(0), "domain")
+check_diagram(codomain_pd_0, kicr.codomain_diagrams().in_dimension(0), "codomain")
+
+image_pd_0, cokernel_pd_0 = image_cokernel_0(K, L)
+check_diagram(image_pd_0, kicr.image_diagrams().in_dimension(0), "image")
+check_diagram(cokernel_pd_0, kicr.cokernel_diagrams().in_dimension(0), "cokernel")